@@ -1,19 +1,23 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
 from setuptools import setup
-from pathlib import Path
 
 try:
     import appdirs
 except Exception:
     pass  # not installed yet probably
 else:
-    # remove the .pickle cache files
+    # remove the .pickle and lark .cache files
     # I'm lazy to hook into the setup functions
-    user_cache_dir = Path(appdirs.user_cache_dir("sfzlint", "jisaacstone"))
-    for pfile in user_cache_dir.rglob('*.pickle'):
-        pfile.unlink()
+    # the cache dir is flat, no need to walk it recursively
+    user_cache_dir = appdirs.user_cache_dir("sfzlint", "jisaacstone")
+    if os.path.isdir(user_cache_dir):
+        with os.scandir(user_cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(('.pickle', '.cache')):
+                    os.unlink(entry.path)
 
 with open("README.md", "r", encoding="utf-8") as fh:
     long_description = fh.read()
@@ -40,7 +44,7 @@ setup(
     },
     install_requires=[
         'appdirs',
-        'lark-parser>=0.7.8',
+        'lark-parser>=0.8.6',
         'pyyaml>=6.0.0'
     ],
     python_requires='>3.6',
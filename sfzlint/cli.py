@@ -2,7 +2,7 @@
 import sys
 from pathlib import Path
 from argparse import ArgumentParser
-from . import spec, parser, lint, opcodes, settings
+from . import spec, settings
 
 
 def print_codes(search=None, filters=None, printer=print):
@@ -17,35 +17,40 @@ def print_code(code, search=None, filters=None, printer=print):
         if not all(code.get(k) == v for k, v in filters):
             return
 
-    data = [
-        code.get('name', '').ljust(25, ' '),
-        code.get('ver', '').ljust(8, ' '),
-        str(code.get('validator', ''))[11:-1].ljust(25, ' ')]
+    name = code.get('name', '')
+    ver = code.get('ver', '')
+    validator = str(code.get('validator', ''))[11:-1]
+    line = f'{name:<25}\t{ver:<8}\t{validator:<25}'
     if 'modulates' in code:
-        data.append(f'modulates={code["modulates"]}')
+        line = f'{line}\tmodulates={code["modulates"]}'
 
-    printer('\t'.join(data))
+    printer(line)
 
 
 def print_codes_in_path(path: Path, search, filters, printer=print):
+    # parsing needs lark, keep it out of the plain listing startup
+    from . import parser, lint, opcodes
     codes = set()
     if path.is_file():
         paths = [path]
     elif path.is_dir():
-        paths = path.rglob('*.sfz')
+        paths = lint.sfz_files(path)
     else:
         raise IOError(f'{path} not found')
 
+    seen = set()  # raw opcodes already substituted, across all files
     for fp in paths:
         try:
-            with fp.open() as fob:
-                contents = fob.read() + '\n'
-                parsed = parser.parser().parse(contents)
-                validator = parser.SFZValidator(config={'file_path': fp})
-                validator.transform(parsed)
-                sfz = validator.config.sfz
-                to_check = {str(k): k for h in sfz.headers for k in h}
-                for raw_oc in to_check.values():
+            parsed = parser.parse(fp.read_text())
+            validator = parser.SFZValidator(config={'file_path': fp})
+            validator.transform(parsed)
+            sfz = validator.config.sfz
+            for header in sfz.headers:
+                for raw_oc in header:
+                    name = str(raw_oc)
+                    if name in seen:
+                        continue
+                    seen.add(name)
                     try:
                         opcode, _ = opcodes.OpcodeIntRepl.sub(raw_oc)
                     except Exception as e:
@@ -95,6 +100,9 @@ def sfzlist(printer=print):
     args = parser.parse_args()
     if not args.no_pickle:
         settings.pickle = True
+    # the full listing is hundreds of lines, write it in blocks
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(line_buffering=False)
     try:
         if args.path:
             print_codes_in_path(args.path, args.search, args.filters, printer)
@@ -105,5 +113,6 @@ def sfzlist(printer=print):
 
 
 def sfzlint():
+    from . import lint
     settings.pickle = True
     return lint.main()
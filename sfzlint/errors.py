@@ -2,9 +2,24 @@
 
 
 class ValidationException(Exception):
-    def __init__(self, message, token):
-        self.message = message
+    '''message can be a str.format template filled from args when read
+
+    for example: ValidationError('unknown opcode ({})', token, opcode)
+    '''
+
+    def __init__(self, message, token, *args):
+        self.template = message
         self.token = token
+        self.format_args = args
+
+    @property
+    def message(self):
+        if self.format_args:
+            return self.template.format(*self.format_args)
+        return self.template
+
+    def __str__(self):
+        return self.message
 
 
 ValidationError = type('ValidationError', (ValidationException,), {})
@@ -10,6 +10,8 @@ class Header(dict):
     used to store opcode pairs under their header tag
     e.g. <global>hivel=25 -> Header<global>{'hivel': 25}
     '''
+    __slots__ = ('token', 'version')  # no per-header __dict__
+
     def __init__(self, token, *args, **kwargs):
         self.token = token
         self.version = header_meta[self.token]['ver']
@@ -23,6 +25,7 @@ class HeaderList(abc.MutableSequence):
     def __init__(self, *headers):
         self.counts = defaultdict(int)
         self._headers = []
+        self._by_token = None  # grouped on first by_token(), reset on change
         self.extend(headers)
 
     def __getitem__(self, *args, **kwargs):
@@ -31,21 +34,33 @@ class HeaderList(abc.MutableSequence):
     def __setitem__(self, key, header):
         old = self._headers[key]
         self._headers[key] = header
+        self._by_token = None
         if old.token != header.token:
-            self._inc_cnt(header.token)
+            self._inc_cnt(header)
             self.counts[old.token] -= 1
 
     def __delitem__(self, key):
         old = self._headers[key]
-        self._headers.__delitem__[key]
+        del self._headers[key]
+        self._by_token = None
         self.counts[old.token] -= 1
 
     def __len__(self):
-        return sum(self.counts.values())
+        return len(self._headers)
 
     def insert(self, pos, item):
         self._inc_cnt(item)
         self._headers.insert(pos, item)
+        self._by_token = None
+
+    def by_token(self, token):
+        '''The headers with this tag, in order'''
+        if self._by_token is None:
+            by_token = defaultdict(list)
+            for header in self._headers:
+                by_token[header.token].append(header)
+            self._by_token = by_token
+        return self._by_token.get(token, ())
 
     def _inc_cnt(self, header):
         self.counts[header.token] += 1
@@ -1,63 +1,115 @@
 # -*- coding: utf-8 -*-
 
+import os
 import re
 import sys
-import xml.etree.ElementTree as ET
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from lark.exceptions import UnexpectedCharacters, UnexpectedToken
 from .parser import validate, SFZ, SFZValidatorConfig
 from . import spec, settings
 
 
+_xml_decl = re.compile(r"(<\?xml[^>]+\?>)")
+
+
 formats = {
     'default': '{path}:{line}:{col}:{sev} {msg}',
     'nopath': '{filename}:{line}:{col}:{sev} {msg}',
 }
 
 
-def ecb(path, e_format=formats['default']):
+def ecb(path, e_format=formats['default'], printer=None):
+    if printer is None:
+        printer = print
+
     def err_callback(sev, msg, token, file_path):
         msg_path = file_path if file_path else path
         message = e_format.format(
             path=msg_path, dirname=path.parent, filename=path.name,
             line=token.line, col=token.column,
             sev=sev[0], msg=msg)
-        print(message)
+        printer(message)
 
     return err_callback
 
 
 def lint(options):
-    spec_versions = set(options.spec_version) if options.spec_version else None
     path = Path(options.file)
-    if not path.exists:
+    if not path.exists():
         raise IOError(f'{path} not found')
     if path.is_dir():
-        filenames = path.glob('**/*.sfz')
+        filenames = sfz_files(path)
     else:
         filenames = path,
-    for filename in filenames:
-        config = SFZValidatorConfig(
-            spec_versions=spec_versions,
-            file_path=filename,
-            check_includes=options.check_includes,
-        )
-        if options.rel_path:
-            config.rel_path = options.rel_path
-        if filename.suffix == '.xml':
-            lint_xml(filename, config)
-        else:
-            lint_sfz(filename, config=config)
-
-
-def lint_xml(filename, config):
-    with open(filename) as fob:
-        xml = fob.read()
+    # callers may build their own options without --jobs
+    jobs = getattr(options, 'jobs', 1)
+    if jobs > 1:
+        # files are independent, lint them in worker processes and print
+        # each file's messages from here so output stays in order
+        # build the tables before the pool starts, forked workers
+        # share them instead of each loading their own copy
+        spec.compact_opcodes()
+        with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(settings.pickle,)) as pool:
+            collect = partial(_lint_collect, options=options)
+            for messages in pool.map(collect, filenames, chunksize=8):
+                for message in messages:
+                    print(message)
+    else:
+        for filename in filenames:
+            lint_file(filename, options)
+
+
+def sfz_files(path):
+    '''Recursively yields the .sfz files under path
+
+    os.walk lists each directory with scandir and only the matches
+    are turned into Path objects
+    '''
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            if filename.endswith('.sfz'):
+                yield Path(dirpath, filename)
+
+
+def _init_worker(use_pickle):
+    settings.pickle = use_pickle
+    # already loaded when forked, otherwise once per worker, not per file
+    spec.compact_opcodes()
+
+
+def _lint_collect(filename, options):
+    messages = []
+    lint_file(filename, options, messages.append)
+    return messages
+
+
+def lint_file(filename, options, printer=None):
+    spec_versions = set(options.spec_version) if options.spec_version else None
+    config = SFZValidatorConfig(
+        spec_versions=spec_versions,
+        file_path=filename,
+        check_includes=options.check_includes,
+    )
+    if options.rel_path:
+        config.rel_path = options.rel_path
+    if filename.suffix == '.xml':
+        lint_xml(filename, config, printer)
+    else:
+        lint_sfz(filename, config, printer)
+
+
+def lint_xml(filename, config, printer=None):
+    import xml.etree.ElementTree as ET  # only aria programs need it
+    xml = filename.read_text()
     # xml is "malformed" because it lacks a single root element
     # solution is to wrap it in a "root" tag
-    tree = ET.fromstring(
-        re.sub(r"(<\?xml[^>]+\?>)", r"\1<root>", xml) + "</root>")
+    tree = ET.fromstring(_xml_decl.sub(r"\1<root>", xml) + "</root>")
     defines = {
         d.attrib['name'][1:]: d.attrib['value']
         for d in tree.findall('.//Define')}
@@ -68,11 +120,11 @@ def lint_xml(filename, config):
         config.check_includes = True  # Always check on program .xml
         if defines:
             config.sfz = SFZ(defines=defines)
-        lint_sfz(ae_path, config)
+        lint_sfz(ae_path, config, printer)
 
 
-def lint_sfz(filename, config):
-    err_cb = ecb(filename)
+def lint_sfz(filename, config, printer=None):
+    err_cb = ecb(filename, printer=printer)
     try:
         validate(filename, err_cb=err_cb, config=config)
     except (UnexpectedCharacters, UnexpectedToken) as e:
@@ -92,7 +144,7 @@ def main():
     parser.add_argument(
         '--spec-version',
         nargs='*',
-        choices=tuple(spec.ver_mapping.values()),
+        choices=spec.versions,
         help='sfz spec to validate against')
     parser.add_argument(
         '-i', '--check-includes',
@@ -101,12 +153,20 @@ def main():
     parser.add_argument(
         '--rel-path',
         help='validate includes and sample paths relative to this path')
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='lint files in JOBS parallel processes')
     parser.add_argument(
         '--no-pickle',
         action='store_true',
         help='do not use the pickle cache (for testing)')
     args = parser.parse_args()
     settings.pickle = not args.no_pickle
+    # a terminal stdout is line buffered, which is one write per message
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(line_buffering=False)
     lint(args)
 
 
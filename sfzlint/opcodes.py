@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
-import re
+import sys
+from functools import lru_cache
 from numbers import Real
-from .errors import ValidationError, ValidationWarning
-from . import spec
-from . import parser
+from .errors import ValidationException, ValidationError, ValidationWarning
+from . import spec, validators
+
+
+def _update_token(token, value):
+    # parser pulls in lark, which plain spec lookups (sfzlist) never need
+    from .parser import update_token
+    return update_token(token, value)
 
 
 class OpcodeIntRepl:
@@ -15,21 +21,32 @@ class OpcodeIntRepl:
     '''
 
     varnames = ['N', 'X', 'Y']
-    re = r'([a-z]*)(\d+)'
     # Some opcodes have numbers in the name, we ignore
-    ignore = {'vel2', 'cutoff2', 'resonance2', 'wave2'}
+    ignore = frozenset({'vel2', 'cutoff2', 'resonance2', 'wave2'})
 
     @classmethod
     def sub(cls, token):
+        if token in spec.opcodes():
+            return token, {}  # no index components, eg 'sample'
+        return cls._normalize(token)
+
+    @classmethod
+    def _normalize(cls, token):
+        # sub without the spec lookup, for callers that already missed
+        value = token.value
+        if (_digits.isdisjoint(value)
+                and not value.startswith(('varN', 'hint_'))
+                and not value.endswith('_mod')):
+            return value, {}  # nothing to substitute, eg an unknown opcode
         instance = cls(token)
-        opcode = re.sub(cls.re, instance, token.value)
+        opcode = instance._scan_cached(value)
         opcode = instance._handle_special_cases(opcode, token)
         return opcode, instance.subs
 
     @classmethod
     def sub_str(cls, string):
         instance = cls(string)
-        opcode = re.sub(cls.re, instance, string)
+        opcode = instance._scan(string)
         return opcode
 
     def _handle_special_cases(self, opcode, token):
@@ -45,140 +62,220 @@ class OpcodeIntRepl:
     def _handle_varNN(self, opcode, token):
         # there are four opcodes that break the pattern
         if opcode[:8] in ('varN_mod', 'varN_onc', 'varN_cur'):
-            return parser.update_token(token, 'varNN' + opcode[4:])
-        self.subs['target'] = parser.update_token(
+            return _update_token(token, 'varNN' + opcode[4:])
+        self.subs['target'] = _update_token(
             token, opcode[5:].replace('X', 'N'))
-        return parser.update_token(token, 'varNN_*')
+        return _update_token(token, 'varNN_*')
 
     def _handle_hint(self, opcode, token):
-        self.subs['target'] = parser.update_token(
+        self.subs['target'] = _update_token(
             token, opcode[5:])
-        return parser.update_token(token, 'hint_*')
+        return _update_token(token, 'hint_*')
 
     def _handle_mod(self, opcode, token):
-        self.subs['target'] = parser.update_token(
+        self.subs['target'] = _update_token(
             token, opcode[:-4])
-        return parser.update_token(token, '*_mod')
+        return _update_token(token, '*_mod')
 
     def __init__(self, raw_opcode):
-        self.index = 0
+        self._varnames = iter(self.varnames)
         self.raw = raw_opcode
         self.subs = dict()
 
-    def __call__(self, match):
-        if match.group() in self.ignore:
-            return match.group()
+    def _scan_cached(self, string):
+        # the same numbered opcodes repeat across every region of a bank
+        cached = _scan_result(string)
+        if isinstance(cached, ValidationException):
+            # same message, pointed at this token
+            raise type(cached)(
+                cached.template, self.raw, *cached.format_args)
+        opcode, subs = cached
+        self.subs = dict(subs)
+        return opcode
+
+    def _scan(self, string):
+        '''Single pass replacement of each ([a-z]*)(\\d+) run in string
+
+        walks the characters once instead of calling back from re.sub
+        '''
+        if _digits.isdisjoint(string):
+            return string  # most opcodes, nothing to replace
+        parts = []
+        last = word = i = 0  # end of copied text, start of [a-z] run
+        length = len(string)
+        while i < length:
+            char = string[i]
+            if 'a' <= char <= 'z':
+                i += 1
+            elif '0' <= char <= '9':
+                end = i + 1
+                while end < length and '0' <= string[end] <= '9':
+                    end += 1
+                parts.append(string[last:word])
+                parts.append(self._replace(string[word:i], string[i:end]))
+                last = word = i = end
+            else:
+                i += 1
+                word = i
+        if not parts:
+            return string
+        parts.append(string[last:])
+        return ''.join(parts)
+
+    def _replace(self, pre, num):
+        matched = pre + num
+        if matched in self.ignore:
+            return matched
         try:
-            sub = self.varnames[self.index]
-            self.index += 1
-        except IndexError:
+            sub = next(self._varnames)
+        except StopIteration:
             raise ValidationError(
-                f'{self.raw} is not a valid opcode: '
-                'unexpected number at {match.group()}',
-                self.raw)
-        pre, num = match.groups()
-        self.subs[sub] = int(num)
-        if pre.endswith('cc'):
-            _validate_cc_value(int(num), self.raw)
+                '{} is not a valid opcode: unexpected number at {}',
+                self.raw, self.raw, matched)
+        value = self.subs[sub] = int(num)
+        # 0-127 are standard, 128-137 in sfz v2, 140-155 in aria
+        if value > 155 and pre.endswith('cc'):
+            raise ValidationWarning(
+                '{} is not a valid control code', self.raw, value)
         return pre + sub
 
 
-def _validate_cc_value(cc_value, token):
-    # 0-127 are standard, 128-137 in sfz v2, 140-155 in aria
-    if cc_value > 155:
-        raise ValidationWarning(
-            f'{cc_value} is not a valid control code', token)
+_digits = frozenset('0123456789')
+
+
+@lru_cache(maxsize=8192)
+def _scan_result(string):
+    '''(opcode, subs) for a raw opcode, or the exception the scan raised'''
+    instance = OpcodeIntRepl(string)
+    try:
+        # interned so the lookup in the spec table can match by identity
+        return sys.intern(instance._scan(string)), instance.subs
+    except ValidationException as e:
+        return e
 
 
 # most players treat cc, _cc, and _oncc interchangeably
+# (variation, alternative) pairs to try, order matters
+_cc_subs = (
+    ('_oncc', '_cc'), ('_oncc', 'cc'),
+    ('_cc', '_oncc'), ('_cc', 'cc'),
+    ('cc', '_oncc'), ('cc', '_cc'),
+)
+
+
 def _try_cc_subs(opcode):
-    cc_alts = ('_oncc', '_cc', 'cc')
-    for variation in cc_alts:  # order matters
+    if 'cc' not in opcode:
+        return None
+    cc_opcodes = spec.cc_opcodes()
+    for variation, alt in _cc_subs:
         if variation in opcode:
-            for alt in cc_alts:
-                if alt != variation:
-                    alternative = opcode.replace(variation, alt)
-                    if alternative in spec.cc_opcodes():
-                        return alternative
+            alternative = opcode.replace(variation, alt)
+            if alternative in cc_opcodes:
+                return alternative
     return None
 
 
 def validate_curvecc(raw_opcode, token, config):
     '''Specializing for now, until we get this into the .yml'''
     opcode, subs = OpcodeIntRepl.sub(raw_opcode)
-    known_op = opcode in spec.opcodes()
-    if known_op:
-        validation = spec.opcodes()[opcode]
+    entry = spec.compact_opcodes().get(opcode)
+    if entry is not None:
+        ver = entry[0]
         spec_ver = config.spec_versions
-        if spec_ver and validation['ver'] not in spec_ver:
+        if spec_ver and ver not in spec_ver:
             raise ValidationError(
-                f'opcode spec {validation["ver"]} is not one of {spec_ver}',
-                raw_opcode)
+                'opcode spec {} is not one of {}', raw_opcode, ver, spec_ver)
 
     err_msg = spec.CurveCCValidator().validate(token.value, config)
     if err_msg:
-        msg = f'{err_msg} ({opcode})'
-        raise ValidationWarning(msg, token)
+        raise ValidationWarning('{} ({})', token, err_msg, opcode)
 
-    if not known_op:
+    if entry is None:
         raise ValidationWarning(
             'curvecc opcode is not in the spec', raw_opcode)
 
 
 def validate_opcode_expr(raw_opcode, token, config):
-    if raw_opcode not in spec.opcodes():
-        opcode, subs = OpcodeIntRepl.sub(raw_opcode)
+    # banks repeat the same opcode=value pairs across regions and layers
+    value = token.value
+    try:
+        key = raw_opcode.value, type(value), value
+        if key in config.valid_pairs:
+            return
+    except TypeError:
+        key = None  # unhashable value, eg a Note
+
+    # one hashed lookup for the common case of a verbatim spec opcode
+    compact = spec.compact_opcodes()
+    entry = compact.get(raw_opcode.value)
+    if entry is None:
+        opcode, subs = OpcodeIntRepl._normalize(raw_opcode)
+        entry = compact.get(opcode)
     else:
         opcode = raw_opcode.value
         subs = {}
 
-    if opcode not in spec.opcodes():
+    if entry is None:
         if 'cc' in opcode and 'curvecc' not in opcode:
             new_opcode = _try_cc_subs(opcode)
             if new_opcode:
                 validate_opcode_expr(
-                    parser.update_token(raw_opcode, new_opcode),
+                    _update_token(raw_opcode, new_opcode),
                     token, config)
                 raise ValidationWarning(
-                    f'undocumented alias of {new_opcode} ({opcode})',
-                    raw_opcode)
-    try:
-        op_meta = spec.opcodes()[opcode]
-    except KeyError:
-        raise ValidationWarning(
-            f'unknown opcode ({opcode})',
-            raw_opcode)
+                    'undocumented alias of {} ({})',
+                    raw_opcode, new_opcode, opcode)
+        raise ValidationWarning('unknown opcode ({})', raw_opcode, opcode)
+    ver, v_type, kind, low, high, validator, index_vdr, target_vdr = entry
 
     spec_versions = config.spec_versions
-    if spec_versions and op_meta['ver'] not in spec_versions:
+    if spec_versions and ver not in spec_versions:
         raise ValidationError(
-            f'opcode spec {op_meta["ver"]} is not one of {spec_versions}',
-            raw_opcode)
-    if op_meta['ver'] == 'cakewalk_v2' and (
-            not spec_versions or op_meta['ver'] not in spec_versions):
+            'opcode spec {} is not one of {}',
+            raw_opcode, ver, spec_versions)
+    if ver == 'cakewalk_v2' and (
+            not spec_versions or ver not in spec_versions):
         raise ValidationWarning(
             'cakewalk v2 opcodes are not implemented by any player',
             raw_opcode)
 
-    if 'value' in op_meta:
-        validation = op_meta['value']
-        v_type = validation.get('type')
-        if v_type and not isinstance(token.value, v_type):
+    if validator is not None:
+        if v_type and not isinstance(value, v_type):
             raise ValidationError(
-                f'expected {typenames[v_type]} got {token.value} ({opcode})',
-                token)
-        err_msg = validation['validator'].validate(token.value, config)
-        if err_msg:
-            msg = f'{err_msg} ({opcode})'
-            raise ValidationWarning(msg, token)
-
-    for meta_k, sub_k in (('index', 'N'), ('target', 'target')):
-        if meta_k in op_meta:
-            err_msg = op_meta[meta_k]['validator'].validate(
-                subs[sub_k], config)
+                'expected {} got {} ({})',
+                token, typenames[v_type], value, opcode)
+        # inline the common checks, only call out to build the message
+        if kind == validators.ANY:
+            valid = True
+        elif kind == validators.RANGE:
+            try:
+                # chained so nan, which fails every compare, is caught
+                valid = low <= value <= high
+            except TypeError:
+                valid = False
+        elif kind == validators.CHOICE:
+            try:
+                valid = value in low
+            except TypeError:
+                valid = False  # unhashable, eg a Note
+        elif kind == validators.MIN:
+            valid = not value < low
+        else:
+            valid = False
+        if not valid:
+            err_msg = validator.validate(value, config)
             if err_msg:
-                msg = f'{err_msg} ({opcode})'
-                raise ValidationWarning(msg, opcode)
+                raise ValidationWarning('{} ({})', token, err_msg, opcode)
+
+    for vdr, sub_k in ((index_vdr, 'N'), (target_vdr, 'target')):
+        if vdr is not None:
+            err_msg = vdr.validate(subs[sub_k], config)
+            if err_msg:
+                raise ValidationWarning('{} ({})', opcode, err_msg, opcode)
+
+    # specialized validators may depend on more than the pair, eg sample
+    if key is not None and (validator is None or kind != validators.OTHER):
+        config.valid_pairs.add(key)
 
 
 typenames = {
@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 
 import re
+import sys
+from stat import S_ISREG
 from pathlib import Path
-from collections import ChainMap
+from collections import ChainMap, OrderedDict
 from lark import Lark, Transformer, Token
-from . import opcodes
+from . import opcodes, settings, spec
 from .errors import ValidationError, ValidationWarning
 from .headers import Header, HeaderList
 
 
 def update_token(token, value):
+    if value is token.value:
+        return token  # unchanged, no need for a copy
     # token.update is not released yet (lark v7.8)
     return Token.new_borrow_pos(
         token.type, value, token)
@@ -26,17 +30,17 @@ class Note(int):
                'ab': 8, 'a': 9, 'a#': 10, 'bb': 10, 'b': 11}
 
     def __new__(cls, note_name):
+        # notes are immutable and a bank spells the same few over and over
+        cached = _note_cache.get((cls, note_name))
+        if cached is not None:
+            return cached
         try:
-            octave = int(note_name[-1])
-            key = note_name[:-1].lower()
-        except (ValueError, KeyError):
-            raise ValueError(f'could not convert string to Note: {note_name}')
-        try:
-            note = Note.notemap[key] + (octave * 12) + 12  # c1 == 24
+            note = _notes[note_name.lower()]
         except KeyError:
-            raise ValueError(f'unknown key: {key}')
+            raise ValueError(f'could not convert string to Note: {note_name}')
         integer = super(Note, cls).__new__(cls, note)
         setattr(integer, 'note_name', note_name)
+        _note_cache[cls, note_name] = integer
         return integer
 
     def __eq__(self, other):
@@ -57,6 +61,19 @@ class Note(int):
         return f'{super(Note, self).__repr__()}({self})'
 
 
+# every name Note accepts, eg 'c#4', with its midi number
+_notes = {
+    f'{key}{octave}': number + (octave * 12) + 12  # c1 == 24
+    for key, number in Note.notemap.items()
+    for octave in range(10)
+}
+
+_note_cache = {}  # (class, name as written) -> Note
+
+# the letter-led strings float() accepts
+_float_words = frozenset({'inf', 'infinity', 'nan'})
+
+
 class SFZ:
     def __init__(self, *headers, defines=None, includes=None):
         self.headers = HeaderList(*headers)
@@ -75,12 +92,13 @@ class SFZ:
     # Just can't think of it at the moment
     @property
     def regions(self):
-        return [h for h in self.headers if h.token == 'region']
+        return list(self.headers.by_token('region'))
 
     @property
     def curves(self):
-        return {h['curve_index'].value: h for h in self.headers
-                if h.token == 'curve' and 'curve_index' in h}
+        return {h['curve_index'].value: h
+                for h in self.headers.by_token('curve')
+                if 'curve_index' in h}
 
     def __str__(self):
         def iter_with_cutoff(cutoff=20):
@@ -103,6 +121,7 @@ class SFZValidatorConfig:
     sfz = None
     spec_versions = None
     default_path = None
+    curves = None  # curve_index -> header, during the curvecc pass
 
     @property
     def sample_dir(self):
@@ -112,6 +131,8 @@ class SFZValidatorConfig:
         return path
 
     def __init__(self, **kwargs):
+        # (opcode, type, value) already validated without complaint
+        self.valid_pairs = set()
         for kw in (
             'warn_undefined_var',
             'validate',
@@ -135,16 +156,26 @@ class SFZValidatorConfig:
         return f'<{self.__class__.__name__} {vars(self)}>'
 
 
+_var_re = re.compile(r'\$\w+')
+# path -> ((mtime, size), parsed include), most recently used last
+_include_trees = OrderedDict()
+_max_include_trees = 32
+
+
+def _ignore(msg, token):
+    pass
+
+
 class SFZValidator(Transformer):
     '''Turns the generated syntax tree into an instance of SFZ'''
 
     def _err(self, msg, token):
-        if self.err_cb and self.config.validate:
+        if self.config.validate:
             fn = self.config.file_name or 'INPUT'
             self.err_cb('ERR', msg, token, fn)
 
     def _warn(self, msg, token):
-        if self.err_cb and self.config.validate:
+        if self.config.validate:
             fn = self.config.file_name or 'INPUT'
             self.err_cb('WARN', msg, token, fn)
 
@@ -160,7 +191,12 @@ class SFZValidator(Transformer):
         if not self.config.sfz:
             self.config.sfz = SFZ()
         self.err_cb = err_cb
-        self._curveccs = []
+        if err_cb is None:
+            # nothing to report to, drop messages without the checks
+            self._err = self._warn = _ignore
+        self._curvecc_opcodes = []
+        self._curvecc_tokens = []
+        self._replaced = {}  # text with $vars -> text after substitution
         super(SFZValidator, self).__init__(*args, **kwargs)
 
     def header(self, items):
@@ -177,6 +213,7 @@ class SFZValidator(Transformer):
         varname, value = items
         s_value = self._sanitize_token(value)
         self.config.sfz.defines[varname.value] = s_value
+        self._replaced.clear()
 
     def include_macro(self, items):
         token, = items
@@ -196,7 +233,12 @@ class SFZValidator(Transformer):
 
     def _load_include(self, inc_path):
         path = self.config.rel_path / inc_path
-        if not path.is_file():
+        try:
+            # one stat both checks the file and keys the tree cache
+            stat = path.stat()
+        except (OSError, ValueError):  # eg a symlink loop or a NUL byte
+            stat = None
+        if stat is None or not S_ISREG(stat.st_mode):
             self._err('could not load include, file not found', inc_path)
         else:
             old_conf = self.config
@@ -206,10 +248,9 @@ class SFZValidator(Transformer):
                  'validate_curvecc': False},  # all will be checked at end
                 vars(self.config)))
             try:
-                with path.open() as fob:
-                    contents = fob.read()
-                    tree = parse(contents)
-                    self.transform(tree)
+                # recently used includes are not parsed again for every
+                # file that includes them, unless they change on disk
+                self.transform(_include_tree(path, stat))
             except Exception as e:
                 self.config = old_conf
                 self._err(f'error loading include, {e}', inc_path)
@@ -224,89 +265,168 @@ class SFZValidator(Transformer):
                            header.token)
 
     def _validate_opcode(self, opcode, value):
-        if self.current_header is None:
+        header = self.current_header
+        if header is None:
             self._err(f'opcode outside of header ({opcode})', opcode)
             return
         if '$' in opcode:
             replaced = self._varreplace(opcode)
             opcode = update_token(opcode, replaced)
-        if opcode in self.current_header:
+        if opcode in header:
             self._warn('duplicate opcode', opcode)
 
-        opcode = update_token(opcode, opcode.lower())
+        # opcodes are almost always lowercase already, only copy the
+        # token (and intern the new name) for the ones that are not
+        lowered = opcode.lower()
+        if lowered != opcode:
+            opcode = update_token(opcode, sys.intern(lowered))
         if '$' in value:
             value = update_token(value, self._varreplace(value))
         token = self._sanitize_token(value)
-        self.current_header[opcode] = token
+        header[opcode] = token
+        config = self.config
         if opcode.value == 'default_path':
-            self.config.default_path = token
-        if not self.config.validate:
+            config.default_path = token
+        if not config.validate or self.err_cb is None:
             return
 
         if 'curvecc' in opcode:
             # curveccs are validated after full file is parsed
             # because the curve_index can appear anywhere in the file
-            self._curveccs.append((opcode, token))
+            self._curvecc_opcodes.append(opcode)
+            self._curvecc_tokens.append(token)
         else:
             try:
-                opcodes.validate_opcode_expr(opcode, token, self.config)
+                opcodes.validate_opcode_expr(opcode, token, config)
             except ValidationError as e:
                 self._err(e.message, e.token)
             except ValidationWarning as e:
                 self._warn(e.message, e.token)
 
     def _varreplace(self, token):
+        # the same $var opcodes and values repeat in every region
+        replaced = self._replaced.get(token.value)
+        if replaced is not None:
+            return replaced
+        defines = self.config.sfz.defines
+        name = token[1:]
+        if (token[0] == '$' and name in defines
+                and name.replace('_', 'a').isalnum()):
+            # a lone $var (same chars as \w+), no need for the regex
+            replaced = str(defines[name])
+            self._replaced[token.value] = replaced
+            return replaced
+        undefined = False
+
         def onmatch(matchobj):
+            nonlocal undefined
             value = matchobj.group(0)[1:]
-            if value not in self.config.sfz.defines:
+            if value not in defines:
+                undefined = True
                 if self.config.warn_undefined_var:
                     self._err(f'undefined variable {value}', token)
                 return matchobj.group(0)
             else:
-                return str(self.config.sfz.defines[value])
+                return str(defines[value])
 
-        return re.sub(r'\$\w+', onmatch, token)
+        replaced = _var_re.sub(onmatch, token)
+        if not undefined:  # keep reporting undefined ones where they are
+            self._replaced[token.value] = replaced
+        return replaced
 
     def _sanitize_token(self, token):
-        if token[0] == '"' and token[-1] == '"':
+        first = token[0]
+        if first == '"' and token[-1] == '"':
             # quoated string
             return update_token(token, token[1:-1])
-        for converter in (int, float, Note):
+        # pick the converter by the first character, most values are
+        # strings or ints and should not raise on the way there
+        if first.isdecimal() or first in '+-.' or first.isspace():
             # numerics
-            try:
-                return update_token(token, converter(token))
-            except ValueError:
-                pass
-        # string
-        return update_token(token, token.strip())
+            for converter in (int, float):
+                try:
+                    return update_token(token, converter(token))
+                except ValueError:
+                    pass
+        else:
+            # notes and inf/nan are short, skip lower() for paths and names
+            if len(token) <= 3 and token.lower() in _notes:
+                return update_token(token, Note(token))
+            stripped = token.value.strip()
+            if len(stripped) <= 8 and stripped.lower() in _float_words:
+                return update_token(token, float(token))
+            return update_token(token, stripped)
+        # string, str.strip hands back the same object when unchanged
+        return update_token(token, token.value.strip())
 
     def _validate_curvecc(self):
-        for opcode, token in self._curveccs:
-            try:
-                opcodes.validate_curvecc(opcode, token, self.config)
-            except ValidationError as e:
-                self._err(e.message, e.token)
-            except ValidationWarning as e:
-                self._warn(e.message, e.token)
+        config = self.config
+        if config.sfz and self._curvecc_opcodes:
+            # parsing is done, build the curve_index map once for all of them
+            config.curves = config.sfz.curves
+        try:
+            for opcode, token in zip(self._curvecc_opcodes,
+                                     self._curvecc_tokens):
+                try:
+                    opcodes.validate_curvecc(opcode, token, config)
+                except ValidationError as e:
+                    self._err(e.message, e.token)
+                except ValidationWarning as e:
+                    self._warn(e.message, e.token)
+        finally:
+            config.curves = None
 
 
 def parser(_singleton=[]):
     '''Returns a Lark parser using the grammar in sfz.lark'''
     if not _singleton:
+        # lark caches the grammar analysis, keyed on a hash of the grammar
+        # and options. Cuts ~20ms off startup. Kept in our own cache dir,
+        # lark's default is a predictable name in the shared temp dir
+        cache = False
+        if settings.pickle:
+            cache_dir = spec.user_cache_dir()
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+            except OSError:
+                pass  # no writable cache dir, build the tables every run
+            else:
+                cache = str(
+                    cache_dir / f'sfz.lark.v{spec.CACHE_VERSION}.cache')
         _singleton.append(
-            Lark.open('sfz.lark', rel_to=__file__, parser='lalr'))
+            Lark.open('sfz.lark', rel_to=__file__, parser='lalr',
+                      cache=cache))
 
     return _singleton[0]
 
 
+def _include_tree(path, stat):
+    key = str(path)
+    signature = stat.st_mtime_ns, stat.st_size
+    cached = _include_trees.get(key)
+    if cached is not None and cached[0] == signature:
+        _include_trees.move_to_end(key)
+        return cached[1]
+    tree = parse(path.read_text())
+    # a changed file replaces its old entry
+    _include_trees[key] = signature, tree
+    _include_trees.move_to_end(key)
+    if len(_include_trees) > _max_include_trees:
+        _include_trees.popitem(last=False)
+    return tree
+
+
 def parse(sfz_string):
-    return parser().parse(sfz_string + '\n')
+    # the grammar needs a trailing newline, most files already have one
+    # and copying a large file just to add it is wasteful
+    if not sfz_string.endswith('\n'):
+        sfz_string += '\n'
+    return parser().parse(sfz_string)
 
 
 def validate(file_path, *args, **kwargs):
-    with open(file_path, 'r') as fob:
-        # can't use the file stream because the lexer calls len()
-        file_data = fob.read()
+    # can't use the file stream because the lexer calls len()
+    file_data = Path(file_path).read_text()
     return validate_s(file_data, *args, **kwargs)
 
 
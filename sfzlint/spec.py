@@ -2,11 +2,11 @@
 
 import os
 import pickle
+import sys
 from functools import lru_cache
 from pathlib import Path
 from numbers import Real  # int or float
 import appdirs
-import yaml
 from . import validators, settings
 
 
@@ -19,6 +19,7 @@ ver_mapping = {
     'Cakewalk': 'cakewalk',
     'Cakewalk SFZ v2': 'cakewalk_v2',  # unimplementd by any player
 }
+versions = tuple(ver_mapping.values())
 
 
 def ver_code(version):
@@ -40,14 +41,21 @@ def listdir(path):
 
 # special-purpose validators
 class TuneValidator(validators.Validator):
+    # ranges are fixed per spec, build them once instead of per call
+    __slots__ = ()
+    aria_range = validators.Range(-2400, 2400)
+    v1_range = validators.Range(-100, 100)
+
     def validate(self, value, config, *args):
         spec_versions = config.spec_versions
         if not spec_versions or 'aria' in spec_versions:
-            return validators.Range(-2400, 2400).validate(value)
-        return validators.Range(-100, 100).validate(value)
+            return self.aria_range.validate(value)
+        return self.v1_range.validate(value)
 
 
 class SampleValidator(validators.Validator):
+    __slots__ = ()
+
     def validate(self, value, config, *args):
         try:
             if value[0] == '*':  # built-in *sine, *square, etc sounds
@@ -72,17 +80,25 @@ class SampleValidator(validators.Validator):
 
 
 class CurveCCValidator(validators.Validator):
+    __slots__ = ()
+
     def validate(self, value, config, *args):
         if value < 0:
             return 'negative curve_index'
         if value < 7:
             # likely a default or built-in curve, no check
             return
-        if config.sfz and value not in config.sfz.curves:
-            return 'no corresponding curve_index found'
+        if config.sfz:
+            curves = config.curves
+            if curves is None:
+                curves = config.sfz.curves
+            if value not in curves:
+                return 'no corresponding curve_index found'
 
 
 class KeyValidator(validators.Range):
+    __slots__ = ()
+
     def validate(self, value, config, *args):
         if value == -1 and config.spec_versions == ['v1']:
             return '-1 is only valid from V2 onward'
@@ -122,6 +138,8 @@ def _override(ops):
 
 def _import(cache=[]):
     if not cache:
+        # only needed when the pickle cache is cold, yaml is slow to import
+        import yaml
         with (Path(__file__).parent / 'syntax.yml').open() as syn_yml:
             syntax = yaml.load(syn_yml, Loader=yaml.SafeLoader)
         cache.append(syntax)
@@ -162,7 +180,7 @@ def op_to_validator(op_data, **kwargs):
     for alias in op_data.get('alias', []):
         alias_meta = {
             'name': alias['name'],
-            'value': {'validator': validators.Alias(op_data['name'])},
+            'value': {'validator': _shared(validators.Alias, op_data['name'])},
         }
         if 'version' in alias:
             alias_meta['ver'] = ver_mapping[alias['version']]
@@ -198,34 +216,60 @@ def _extract_vdr_meta(op_data, valid_meta):
                 valid_meta[v_key]['type'] = type_mapping[type_name]
 
 
+# many opcodes have identical value specs, eg Range(0,127)
+# share one validator instance between them instead of one each
+_validators = {}
+
+
+def _shared(cls, *args):
+    # include the types so Range(0, 1) and Range(0.0, 1.0) stay distinct
+    key = (cls, args, tuple(type(a) for a in args))
+    if key not in _validators:
+        _validators[key] = cls(*args)
+    return _validators[key]
+
+
 def _validator(data_value):
     if 'min' in data_value:
         if 'max' in data_value:
             if not isinstance(data_value['max'], Real):
                 # string value, eg "SampleRate / 2"
-                return validators.Min(data_value['min'])
-            return validators.Range(data_value['min'], data_value['max'])
-        return validators.Min(data_value['min'])
+                return _shared(validators.Min, data_value['min'])
+            return _shared(
+                validators.Range, data_value['min'], data_value['max'])
+        return _shared(validators.Min, data_value['min'])
     if 'options' in data_value:
-        return validators.Choice(
-            [o['name'] for o in data_value['options']])
-    return validators.Any()
+        return _shared(
+            validators.Choice,
+            tuple(o['name'] for o in data_value['options']))
+    return _shared(validators.Any)
+
+
+# bump when the pickled validator classes change shape (eg __slots__)
+# so caches written by other versions are not read back
+CACHE_VERSION = 2
+
+
+def user_cache_dir():
+    return Path(appdirs.user_cache_dir("sfzlint", "jisaacstone"))
 
 
 def _pickled(name, fn):
     # pickling as cache cuts script time by ~400ms on my system
     if not settings.pickle:
         return fn()
-    user_cache_dir = Path(appdirs.user_cache_dir("sfzlint", "jisaacstone"))
-    p_file = user_cache_dir / f'{name}.pickle'
-    if not p_file.exists():
-        data = fn()
-        user_cache_dir.mkdir(parents=True, exist_ok=True)
-        with p_file.open('wb') as fob:
-            pickle.dump(data, fob)
-    else:
-        with p_file.open('rb') as fob:
-            data = pickle.load(fob)
+    cache_dir = user_cache_dir()
+    p_file = cache_dir / f'{name}.v{CACHE_VERSION}.pickle'
+    if p_file.exists():
+        try:
+            with p_file.open('rb') as fob:
+                return pickle.load(fob)
+        except Exception:
+            pass  # truncated, or from a build with other classes. rebuild
+    data = fn()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with p_file.open('wb') as fob:
+        pickle.dump(data, fob, pickle.HIGHEST_PROTOCOL)
     return data
 
 
@@ -234,7 +278,9 @@ _cache = {}
 
 def opcodes():
     if 'opcodes' not in _cache:
-        _cache['opcodes'] = _pickled('opcodes', lambda: _override(_extract()))
+        data = _pickled('opcodes', lambda: _override(_extract()))
+        # unpickled keys are not interned, lookups are by opcode name
+        _cache['opcodes'] = {sys.intern(k): v for k, v in data.items()}
     return _cache['opcodes']
 
 
@@ -243,3 +289,57 @@ def cc_opcodes():
         _cache['cc_opcodes'] = {
             k for k in opcodes() if 'cc' in k and 'curvecc' not in k}
     return _cache['cc_opcodes']
+
+
+def _resolve_alias(validator):
+    # point aliases straight at the target validator so validating
+    # an alias is not two dict lookups and an extra call each time
+    seen = set()
+    while type(validator) is validators.Alias:
+        if validator.name in seen:
+            return None
+        seen.add(validator.name)
+        target = opcodes().get(validator.name, {}).get('value')
+        validator = target.get('validator') if target else None
+    return validator
+
+
+def _compact(op_meta):
+    value = op_meta.get('value', {})
+    validator = _resolve_alias(value.get('validator'))
+    kind = validators.kind(validator)
+    low = high = None
+    if kind == validators.MIN:
+        low = validator.minimum
+    elif kind == validators.RANGE:
+        low, high = validator.low, validator.high
+    elif kind == validators.CHOICE:
+        low = validator.choices
+    index = op_meta.get('index', {}).get('validator')
+    target = op_meta.get('target', {}).get('validator')
+    v_type = value.get('type')
+    if v_type is object:
+        v_type = None  # overridden to accept anything, skip the isinstance
+    if kind == validators.ANY and v_type is None:
+        validator = None  # nothing to check, skip the value entirely
+    return (op_meta['ver'], v_type, kind, low, high,
+            validator, index, target)
+
+
+def compact_opcodes():
+    '''opcodes() flattened into tuples for the validation hot path
+
+    (ver, type, kind, low, high, validator, index_validator, target_validator)
+    where low/high hold the bounds, minimum, or choices depending on kind
+    and validator is None when any value is accepted
+    '''
+    if 'compact_opcodes' not in _cache:
+        # opcodes with the same spec share one entry, eg all the v1
+        # Range(0,127) integers, like the validators they point at
+        entries = {}
+        table = {}
+        for name, op_meta in opcodes().items():
+            entry = _compact(op_meta)
+            table[name] = entries.setdefault(entry, entry)
+        _cache['compact_opcodes'] = table
+    return _cache['compact_opcodes']
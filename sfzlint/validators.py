@@ -3,7 +3,13 @@ from . import opcodes
 from . import spec
 
 
+# tags for validators whose checks validate_opcode_expr can inline
+ANY, MIN, RANGE, CHOICE, OTHER = range(5)
+
+
 class Validator:
+    __slots__ = ()
+
     def validate(self, value, *args):
         raise NotImplementedError
 
@@ -12,50 +18,69 @@ class Validator:
 
 
 class Any(Validator):
+    __slots__ = ()
+
     def validate(self, value, *args):
         return None
 
 
 class Min(Validator):
+    __slots__ = ('minimum',)
+
     def __init__(self, minimum):
         self.minimum = minimum
 
     def validate(self, value, *args):
         if value < self.minimum:
-            return f'{value} less than minimum of {self.minimum}',
+            return f'{value} less than minimum of {self.minimum}'
 
     def __str__(self):
         return f'<Validator.Min({self.minimum})>'
 
 
 class Range(Validator):
+    __slots__ = ('low', 'high')
+
     def __init__(self, low, high):
         self.low = low
         self.high = high
 
     def validate(self, value, *args):
+        low, high = self.low, self.high
         try:
-            if not self.low <= value <= self.high:
-                return f'{value} not in range {self.low} to {self.high}'
+            if not (low <= value <= high):  # also catches nan
+                return f'{value} not in range {low} to {high}'
         except TypeError:
-            return f'cannot compare {value} with {self.low}, {self.high}'
+            return f'cannot compare {value} with {low}, {high}'
 
     def __str__(self):
         return f'<Validator.Range({self.low},{self.high})>'
 
 
 class Choice(Validator):
+    __slots__ = ('choices', 'names')
+
     def __init__(self, choices):
-        self.choices = choices
+        self.choices = frozenset(choices)
+        self.names = list(choices)  # spec order, for messages
 
     def validate(self, value, *args):
-        if value not in self.choices:
-            subbed = opcodes.OpcodeIntRepl.sub_str(value)
-            if subbed not in self.choices:
-                return f'{value} not one of {self.choices}'
+        try:
+            if value in self.choices:
+                return
+        except TypeError:
+            # unhashable, eg a Note, cannot be one of the names
+            return f'{value} not one of {self.names}'
+        # only names with digits can normalize to a choice, eg eq1_freq
+        if isinstance(value, str) and not opcodes._digits.isdisjoint(value):
+            if opcodes.OpcodeIntRepl.sub_str(value) in self.choices:
+                return
+        return f'{value} not one of {self.names}'
 
 
 class Alias(Validator):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
@@ -66,3 +91,12 @@ class Alias(Validator):
 
     def __str__(self):
         return f'<Validator.Alias({self.name})>'
+
+
+def kind(validator):
+    '''The inline tag for validator, OTHER for anything specialized'''
+    # exact types only, subclasses override validate
+    return _kinds.get(type(validator), OTHER)
+
+
+_kinds = {Any: ANY, Min: MIN, Range: RANGE, Choice: CHOICE}
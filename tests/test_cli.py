@@ -4,9 +4,10 @@ import os
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 from pathlib import Path
+from tempfile import TemporaryDirectory
 from collections import namedtuple
 from sfzlint.cli import sfzlint, sfzlist
-from sfzlint import settings
+from sfzlint import lint, settings
 
 
 fixture_dir = Path(__file__).parent / 'fixtures'
@@ -54,6 +55,11 @@ class TestSFZLint(TestCase):
         calls = [ErrMsg(*a[0][0].split(':'))
                  for a in print_mock.call_args_list]
         self.assert_has_message('unknown opcode', calls)
+        # the message is formatted text, not the repr of its args
+        lines = [a[0][0] for a in print_mock.call_args_list]
+        self.assertIn(
+            f'{fixture_dir / "basic/bad.sfz"}:8:7:W '
+            '20000 not in range 0 to 100 (delay)', lines)
 
     @patchargs('basic')
     def test_lint_dir(self):
@@ -64,6 +70,15 @@ class TestSFZLint(TestCase):
                  for a in print_mock.call_args_list]
         self.assert_has_message('unknown opcode', calls)
 
+    @patchargs('basic', '--jobs', '2')
+    def test_lint_dir_jobs(self):
+        with patch('builtins.print') as print_mock:
+            sfzlint()
+        self.assertTrue(print_mock.called)
+        calls = [ErrMsg(*a[0][0].split(':'))
+                 for a in print_mock.call_args_list]
+        self.assert_has_message('unknown opcode', calls)
+
     @patchargs('include/inbadfile.sfz')
     def test_include_parse_error(self):
         with patch('builtins.print') as print_mock:
@@ -139,6 +154,19 @@ class TestSFZLint(TestCase):
         self.assertEqual(1, len(calls), calls)
         self.assertIn('foo', calls[0].message)
 
+    @patchargs('basic/missing.sfz')
+    def test_missing_path(self):
+        with self.assertRaises(IOError):
+            sfzlint()
+
+    def test_sfz_files(self):
+        found = {p.relative_to(fixture_dir).as_posix()
+                 for p in lint.sfz_files(fixture_dir)}
+        # nested dirs are walked, the .xml and .wav files are skipped
+        self.assertIn('include/sub/relpath.sfz', found)
+        self.assertIn('basic/valid.sfz', found)
+        self.assertEqual({p.rsplit('.', 1)[1] for p in found}, {'sfz'})
+
 
 class TestSFZList(TestCase):
     @patch('sys.argv', new=['sfzlist', '--no-pickle'])
@@ -176,3 +204,28 @@ class TestSFZList(TestCase):
             self.assertIn(test_opcode, opcodes)
         for test_opcode in ('cutoff2_onccN', 'curve_index', '*_mod'):
             self.assertNotIn(test_opcode, opcodes)
+
+    @patch('sys.argv', new=[
+        'sfzlist', '--no-pickle', '--path', str(fixture_dir / 'list')])
+    def test_path_numbered_spec_opcode(self):
+        print_mock = MagicMock()
+        sfzlist(print_mock)
+        codes = {line[0][0].split()[0]: line[0][0].split()[1]
+                 for line in print_mock.call_args_list}
+        # in the spec as written, not normalized to an unknown filN_type
+        self.assertEqual(codes['fil2_type'], 'v2')
+        self.assertEqual(codes['effect1'], 'v1')
+        self.assertNotIn('filN_type', codes)
+
+
+class TestPickleCache(TestCase):
+    @patch.object(settings, 'pickle', new=True)
+    def test_unreadable_cache_is_rebuilt(self):
+        from sfzlint import spec
+        with TemporaryDirectory() as cache_dir, \
+                patch('appdirs.user_cache_dir', return_value=cache_dir):
+            p_file = Path(cache_dir) / f'test.v{spec.CACHE_VERSION}.pickle'
+            # eg written by a release whose validators had a __dict__
+            p_file.write_bytes(b'not a pickle')
+            self.assertEqual(spec._pickled('test', lambda: {'a': 1}), {'a': 1})
+            self.assertEqual(spec._pickled('test', lambda: {}), {'a': 1})
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 
 from unittest import TestCase
-from sfzlint import parser
+from sfzlint import parser, opcodes
+from sfzlint.errors import ValidationWarning
 from inspect import cleandoc
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
 
 class TestInvalid(TestCase):
@@ -44,6 +47,17 @@ class TestInvalid(TestCase):
         (_sev, _msg, token, _), = errs
         self.assertEqual(token, 'sample')
 
+    def test_range_message(self):
+        config = parser.SFZValidatorConfig()
+        with self.assertRaises(ValidationWarning) as cm:
+            opcodes.validate_opcode_expr(
+                parser.Token('OPCODE', 'resonance_smoothcc1'),
+                parser.Token('OPCODE_VALUE', -200), config)
+        self.assertEqual(
+            str(cm.exception),
+            '-200 less than minimum of 0 (resonance_smoothccN)')
+        self.assertEqual(cm.exception.message, str(cm.exception))
+
     def test_invalid_version(self):
         _, errs = self._parse(
             '''
@@ -61,6 +75,16 @@ class TestInvalid(TestCase):
         (_sev, _msg, token, _), = errs
         self.assertEqual(token, -400)
 
+    def test_note_choice(self):
+        _, errs = self._parse(
+            '''
+            <region>
+            filtype=c4 looptype=C#4 loopmode=c4
+            ''')
+        self.assertEqual(len(errs), 3)
+        for _sev, msg, _token, _ in errs:
+            self.assertIn('not one of', msg)
+
     def test_unknown_cc_format(self):
         _, errs = self._parse(
             '''
@@ -80,6 +104,24 @@ class TestInvalid(TestCase):
         (_sev, _, token, _), = errs
         self.assertEqual(token, 'amplitude_oncc420')
 
+    def test_repeated_bad_control_code(self):
+        _, errs = self._parse(
+            '''
+            <region>amplitude_oncc420=75
+            <region>amplitude_oncc420=75
+            ''')
+        lines = [token.line for (_sev, _, token, _) in errs]
+        self.assertEqual(lines, [1, 2])
+
+    def test_repeated_invalid_value(self):
+        _, errs = self._parse(
+            '''
+            <region>pan=200 volume=1
+            <region>pan=200 volume=1
+            ''')
+        lines = [token.line for (_sev, _, token, _) in errs]
+        self.assertEqual(lines, [1, 2])
+
     def test_custom_curve(self):
         sfz, errs = self._parse(
             '''
@@ -96,6 +138,39 @@ class TestInvalid(TestCase):
         (_sev, _, token, _), = errs
         self.assertEqual(token, 19)
 
+    def test_alias_value(self):
+        _, errs = self._parse(
+            '''
+            <region>
+            loopmode=forever
+            ''')
+        (_sev, msg, token, _), = errs
+        self.assertEqual(token, 'forever')
+        self.assertIn('not one of', msg)
+
+    def test_alias_numeric_choice(self):
+        _, errs = self._parse(
+            '''
+            <region>
+            loopmode=1
+            ''')
+        (_sev, msg, token, _), = errs
+        self.assertEqual(token, 1)
+        self.assertIn('not one of', msg)
+
+    def test_include_not_found(self):
+        with TemporaryDirectory() as tmp:
+            (Path(tmp) / 'loop.sfz').symlink_to('loop.sfz')
+            _, errs = self._parse(
+                '''
+                #include "missing.sfz"
+                #include "loop.sfz"
+                ''', rel_path=tmp)
+        self.assertEqual(
+            [(msg, token) for _sev, msg, token, _ in errs],
+            [('could not load include, file not found', 'missing.sfz'),
+             ('could not load include, file not found', 'loop.sfz')])
+
     def test_vN_too_high(self):
         sfz, errs = self._parse(
             '''
@@ -3,6 +3,8 @@
 from unittest import TestCase
 from sfzlint import parser
 from inspect import cleandoc
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
 
 class TestValid(TestCase):
@@ -160,6 +162,25 @@ class TestValid(TestCase):
         self.assertEqual(sfz.headers[0]['hikey'], -1)
         self.assertEqual(sfz.headers[0]['lokey'], -1)
 
+    def test_range_bounds(self):
+        sfz = self._parse(
+            '''
+            <region>
+            lovel=1 hivel=127
+            amp_veltrack=-100 pan=100
+            ''')
+        self.assertEqual(sfz.headers[0]['lovel'], 1)
+        self.assertEqual(sfz.headers[0]['hivel'], 127)
+
+        errs = []
+        parser.validate_s(
+            '<region> pan=nan volume=nan\n',
+            err_cb=lambda *args: errs.append(args))
+        self.assertEqual(
+            [msg for _sev, msg, _token, _ in errs],
+            ['nan not in range -100 to 100 (pan)',
+             'nan not in range -144 to 6 (volume)'])
+
     def test_hint(self):
         sfz = self._parse(
             '''
@@ -197,6 +218,45 @@ class TestValid(TestCase):
             ''')
         self.assertEqual(sfz.headers[0]['sample'], 'samples/chello/c4.wav')
 
+    def test_redefine(self):
+        sfz = self._parse(
+            '''
+            #define $v 1
+            <region> amp_velcurve_$v=0.5 lovel=$v
+            #define $v 2
+            <region> amp_velcurve_$v=0.5 lovel=$v
+            ''')
+        first, second = sfz.regions
+        self.assertEqual(first['lovel'], 1)
+        self.assertIn('amp_velcurve_1', first)
+        self.assertEqual(second['lovel'], 2)
+        self.assertIn('amp_velcurve_2', second)
+
+        errs = []
+        parser.validate_s(
+            '<region> sample=$u.wav\n<region> sample=$u.wav\n',
+            err_cb=lambda *args: errs.append(args))
+        self.assertEqual(
+            [(msg, token.line) for _sev, msg, token, _ in errs],
+            [('undefined variable u', 1), ('undefined variable u', 2)])
+
+    def test_define_names(self):
+        sfz = self._parse(
+            '''
+            #define $a 1
+            #define $ab 2
+            #define $a_b 3
+            #define $x samples
+            <region> lovel=$ab hivel=$a_b sample=$x.wav
+            <region> lovel=$a
+            ''')
+        first, second = sfz.regions
+        # the lone $var lookup must pick the same define as _var_re
+        self.assertEqual(first['lovel'], 2)
+        self.assertEqual(first['hivel'], 3)
+        self.assertEqual(first['sample'], 'samples.wav')
+        self.assertEqual(second['lovel'], 1)
+
     def test_valid(self):
         sfz = self._parse(
             '''
@@ -238,3 +298,37 @@ class TestValid(TestCase):
             ''')
         self.assertEqual(sfz.headers[0]['amplitude_curvecc110'], 9)
         self.assertIn(9, sfz.curves)
+
+    def test_header_list(self):
+        sfz = self._parse(
+            '''
+            <group> volume=1
+            <region> sample=*sine
+            <region> sample=*saw
+            ''')
+        headers = sfz.headers
+        self.assertEqual(len(headers), 3)
+        self.assertEqual(len(sfz.regions), 2)
+        del headers[1]
+        self.assertEqual(len(headers), 2)
+        self.assertEqual(headers.counts['region'], 1)
+        self.assertEqual(len(sfz.regions), 1)
+        headers[0] = headers[1]
+        self.assertEqual(headers.counts['group'], 0)
+        self.assertEqual(headers.counts['region'], 2)
+        self.assertEqual(len(sfz.regions), 2)
+
+    def test_changed_include_replaces_cached_tree(self):
+        with TemporaryDirectory() as tmp:
+            inc = Path(tmp) / 'inc.sfz'
+            inc.write_text('<region> lovel=1\n')
+            sfz = parser.validate_s(
+                '#include "inc.sfz"\n', config={'rel_path': tmp})
+            self.assertEqual(sfz.regions[0]['lovel'], 1)
+            inc.write_text('<region> lovel=2 hivel=3\n')
+            sfz = parser.validate_s(
+                '#include "inc.sfz"\n', config={'rel_path': tmp})
+            self.assertEqual(sfz.regions[0]['lovel'], 2)
+            # one entry per path, holding the new version
+            (_mtime, size), _tree = parser._include_trees[str(inc)]
+            self.assertEqual(size, inc.stat().st_size)